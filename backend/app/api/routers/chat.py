@@ -1,19 +1,52 @@
 """Chat endpoints."""
-import json
+import asyncio
 import logging
-from typing import List
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from collections import OrderedDict
+from typing import Dict, Any
+import orjson
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from app.models.chat import ChatRequest, ChatResponse, FeedbackRequest, SourceNode
 from app.services.rag_service import rag_service
-from app.services.file_service import process_uploaded_files, format_file_context
-from app.langfuse_client import observe, get_client, langfuse
+from app.services.query_validator import needs_retrieval
+from app.services.file_service import (
+    UploadError,
+    UploadTooLargeError,
+    close_uploaded_files,
+    parse_multipart_form,
+    process_uploaded_files,
+    format_file_context,
+)
+from app.services.streaming import sse_event
+from app.langfuse_client import observe, client as langfuse_client
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+# Characters of source text returned to the client
+SOURCE_PREVIEW_CHARS = 300
+
+# Last feedback value submitted per trace, oldest first
+MAX_TRACKED_FEEDBACK = 4096
+_submitted_feedback: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _to_source_node(source: Dict[str, Any]) -> SourceNode:
+    """Build a SourceNode with the text cut down to a short preview."""
+    text = source["text"]
+    if len(text) > SOURCE_PREVIEW_CHARS:
+        text = text[:SOURCE_PREVIEW_CHARS] + "..."
+
+    return SourceNode(
+        id=source["id"],
+        text=text,
+        score=source["score"],
+        url=source.get("url"),
+        framework=source.get("framework")
+    )
+
 
 @router.post("", response_model=ChatResponse)
 @observe()
@@ -24,42 +57,35 @@ async def chat(request: ChatRequest):
     Retrieves relevant documentation and generates answer.
     """
     try:
-        logger.info("=" * 80)
-        logger.info(f"NEW CHAT QUERY")
-        logger.info(f"Message: {request.message}")
-        logger.info(f"Frameworks: {request.frameworks}")
-        logger.info("=" * 80)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("=" * 80)
+            logger.info("NEW CHAT QUERY")
+            logger.info("Message: %s", request.message)
+            logger.info("Frameworks: %s", request.frameworks)
+            logger.info("=" * 80)
 
-        # Convert history to dict format
-        history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in request.history
-        ]
-
-        # Query RAG service
-        answer, sources = await rag_service.query(
-            question=request.message,
-            frameworks=request.frameworks,
-            history=history
-        )
+        # Convert history to dict format in a single serializer pass
+        history = request.model_dump(include={"history"})["history"]
+
+        if not needs_retrieval(request.message):
+            # Small talk and follow-ups skip embedding and search entirely
+            logger.info("Conversational message, skipping retrieval")
+            answer = await rag_service.answer_no_context(request.message, history)
+            sources = []
+        else:
+            # Query RAG service
+            answer, sources = await rag_service.query(
+                question=request.message,
+                frameworks=request.frameworks,
+                history=history
+            )
 
-        logger.info(f"Response generated with {len(sources)} sources")
+        logger.info("Response generated with %s sources", len(sources))
 
         # Format sources
-        source_nodes = [
-            SourceNode(
-                id=s["id"],
-                text=s["text"][:300] + "..." if len(s["text"]) > 300 else s["text"],
-                score=s["score"],
-                metadata=s["metadata"],
-                url=s.get("url"),
-                framework=s.get("framework")
-            )
-            for s in sources
-        ]
+        source_nodes = [_to_source_node(s) for s in sources]
 
         # Update Langfuse trace
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             input={
                 "message": request.message,
@@ -86,7 +112,6 @@ async def chat(request: ChatRequest):
         )
 
     except Exception as e:
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             output={"error": str(e)},
             metadata={"error_type": type(e).__name__}
@@ -94,33 +119,132 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/upload", response_model=ChatResponse)
+@router.post("/stream")
 @observe()
-async def chat_with_files(
-    message: str = Form(""),
-    frameworks: str = Form("[]"),
-    history: str = Form("[]"),
-    files: List[UploadFile] = File(default=[])
-):
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint for documentation Q&A.
+
+    Streams the answer as server-sent events: one `data` frame per text
+    delta, then a terminal `sources` event with the sources and trace ID.
+    Failures after the stream has started are sent as an `error` event.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("=" * 80)
+        logger.info("NEW STREAMING CHAT QUERY")
+        logger.info("Message: %s", request.message)
+        logger.info("Frameworks: %s", request.frameworks)
+        logger.info("=" * 80)
+
+    # Convert history to dict format in a single serializer pass
+    history = request.model_dump(include={"history"})["history"]
+
+    async def event_stream():
+        try:
+            if not needs_retrieval(request.message):
+                # Small talk and follow-ups skip embedding and search entirely
+                logger.info("Conversational message, skipping retrieval")
+                answer = await rag_service.answer_no_context(request.message, history)
+                sources = []
+                yield sse_event({"delta": answer})
+            else:
+                # Reuse a cached answer for the same or a similar question
+                cached = await rag_service.lookup_cached(
+                    request.message, request.frameworks, history
+                )
+
+                if cached:
+                    answer, sources = cached
+                    yield sse_event({"delta": answer})
+                else:
+                    sources = await rag_service.retrieve(request.message, request.frameworks)
+
+                    answer_parts = []
+                    async for delta in rag_service.stream_answer(request.message, sources, history):
+                        answer_parts.append(delta)
+                        yield sse_event({"delta": delta})
+
+                    answer = "".join(answer_parts)
+                    await rag_service.cache_answer(
+                        request.message, request.frameworks, history, answer, sources
+                    )
+
+            logger.info("Response streamed with %s sources", len(sources))
+
+            # Format sources
+            source_nodes = [_to_source_node(s).model_dump(mode="json") for s in sources]
+
+            # Update Langfuse trace
+            langfuse_client.update_current_trace(
+                input={
+                    "message": request.message,
+                    "frameworks": request.frameworks,
+                },
+                output={
+                    "answer": answer[:500],
+                    "num_sources": len(sources),
+                },
+                metadata={
+                    "frameworks": request.frameworks,
+                    "message_length": len(request.message),
+                    "history_length": len(request.history),
+                    "top_scores": [s["score"] for s in sources[:3]],
+                    "streaming": True,
+                }
+            )
+
+            trace_id = langfuse_client.get_current_trace_id()
+
+            yield sse_event({"sources": source_nodes, "trace_id": trace_id}, event="sources")
+
+        except Exception as e:
+            logger.error("Error in chat_stream: %s", e)
+            langfuse_client.update_current_trace(
+                output={"error": str(e)},
+                metadata={"error_type": type(e).__name__}
+            )
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/upload", response_model=ChatResponse)
+@observe(capture_input=False)
+async def chat_with_files(request: Request):
     """
     Chat endpoint with file upload support.
 
     Processes uploaded files and includes their content in the context.
+
+    Expects a multipart/form-data body; see parse_multipart_form().
     """
+    files = []
     try:
+        # Stream the multipart body, rejecting oversized files early
+        form, files = await parse_multipart_form(request)
+        message = form.get("message", "")
+
         # Parse JSON strings
-        frameworks_list = json.loads(frameworks)
-        history_list = json.loads(history)
+        frameworks_list = orjson.loads(form.get("frameworks", "[]"))
+        history_list = orjson.loads(form.get("history", "[]"))
 
-        logger.info("=" * 80)
-        logger.info(f"NEW CHAT WITH FILES")
-        logger.info(f"Message: {message}")
-        logger.info(f"Frameworks: {frameworks_list}")
-        logger.info(f"Files: {[f.filename for f in files]}")
-        logger.info("=" * 80)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("=" * 80)
+            logger.info("NEW CHAT WITH FILES")
+            logger.info("Message: %s", message)
+            logger.info("Frameworks: %s", frameworks_list)
+            logger.info("Files: %s", [f.filename for f in files])
+            logger.info("=" * 80)
 
-        # Process uploaded files
-        file_content = await process_uploaded_files(files)
+        # Retrieval only needs the message, so run it while files are processed
+        sources = None
+        if message:
+            sources, file_content = await asyncio.gather(
+                rag_service.retrieve(message, frameworks_list),
+                process_uploaded_files(files)
+            )
+        else:
+            file_content = await process_uploaded_files(files)
         file_context = format_file_context(file_content)
 
         # Combine message with file context
@@ -128,30 +252,22 @@ async def chat_with_files(
         if file_context:
             enhanced_message = f"{file_context}\n\nUser question: {message}" if message else file_context
 
-        # Query RAG service
-        answer, sources = await rag_service.query(
+        # Without a message, retrieve against the file content instead
+        if sources is None:
+            sources = await rag_service.retrieve(enhanced_message, frameworks_list)
+
+        answer = await rag_service.generate_from_context(
             question=enhanced_message,
-            frameworks=frameworks_list,
+            search_results=sources,
             history=history_list
         )
 
-        logger.info(f"Response generated with {len(sources)} sources")
+        logger.info("Response generated with %s sources", len(sources))
 
         # Format sources
-        source_nodes = [
-            SourceNode(
-                id=s["id"],
-                text=s["text"][:300] + "..." if len(s["text"]) > 300 else s["text"],
-                score=s["score"],
-                metadata=s["metadata"],
-                url=s.get("url"),
-                framework=s.get("framework")
-            )
-            for s in sources
-        ]
+        source_nodes = [_to_source_node(s) for s in sources]
 
         # Update Langfuse trace
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             input={
                 "message": message,
@@ -178,30 +294,60 @@ async def chat_with_files(
             trace_id=trace_id
         )
 
-    except json.JSONDecodeError as e:
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"Upload too large: {str(e)}")
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        # Nobody is left to read a response; skip error logging and tracing
+        logger.info("Client disconnected during upload")
+        return Response(status_code=499)  # Client Closed Request
+    except orjson.JSONDecodeError as e:
         raise HTTPException(status_code=422, detail=f"Invalid JSON: {str(e)}")
     except Exception as e:
-        logger.error(f"Error in chat_with_files: {e}")
-        langfuse_client = get_client()
+        logger.error("Error in chat_with_files: %s", e)
         langfuse_client.update_current_trace(
             output={"error": str(e)},
             metadata={"error_type": type(e).__name__}
         )
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await close_uploaded_files(files)
 
 
-@router.post("/feedback")
-async def submit_feedback(request: FeedbackRequest):
-    """Submit user feedback for a chat response."""
+async def _record_feedback(request: FeedbackRequest) -> None:
+    """Send a feedback score to Langfuse, remembering the value once it is stored."""
     try:
-        langfuse.score(
-            id=f"{request.trace_id}_feedback",
+        await asyncio.to_thread(
+            langfuse_client.create_score,
+            score_id=request.trace_id + "_feedback",
             trace_id=request.trace_id,
             name="user_feedback",
             data_type="CATEGORICAL",
             value=request.value,
             comment=request.comment,
         )
-        return {"status": "success", "trace_id": request.trace_id}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # Leave the value untracked so a retry is not dropped as a duplicate
+        logger.error("Error recording feedback for trace %s: %s", request.trace_id, e)
+        return
+
+    _submitted_feedback[request.trace_id] = request.value
+    _submitted_feedback.move_to_end(request.trace_id)
+    if len(_submitted_feedback) > MAX_TRACKED_FEEDBACK:
+        _submitted_feedback.popitem(last=False)
+
+
+@router.post("/feedback", status_code=202)
+async def submit_feedback(request: FeedbackRequest, background_tasks: BackgroundTasks):
+    """
+    Submit user feedback for a chat response.
+
+    The score is recorded in a background task after the response is sent.
+    Resubmitting the current value for a trace (e.g. a double-click) is a no-op.
+    """
+    if _submitted_feedback.get(request.trace_id) == request.value:
+        return {"status": "accepted", "trace_id": request.trace_id}
+
+    background_tasks.add_task(_record_feedback, request)
+    return {"status": "accepted", "trace_id": request.trace_id}
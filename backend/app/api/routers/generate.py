@@ -1,15 +1,23 @@
 """Code generation endpoints."""
-import json
+import asyncio
 import logging
-from typing import List
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.requests import ClientDisconnect
 from app.models.chat import CodeGenerationRequest, CodeGenerationResponse
 from app.services.code_generation_service import code_generation_service
-from app.services.file_service import process_uploaded_files, format_file_context
-from app.langfuse_client import observe, get_client
+from app.services.file_service import (
+    UploadError,
+    UploadTooLargeError,
+    close_uploaded_files,
+    parse_multipart_form,
+    process_uploaded_files,
+    format_file_context,
+)
+from app.services.streaming import sse_event
+from app.langfuse_client import observe, client as langfuse_client
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/generate", tags=["generate"])
@@ -25,18 +33,16 @@ async def generate_code(request: CodeGenerationRequest):
     optionally including relevant documentation as context.
     """
     try:
-        logger.info("=" * 80)
-        logger.info(f"CODE GENERATION REQUEST")
-        logger.info(f"Prompt: {request.prompt}")
-        logger.info(f"Frameworks: {request.frameworks}")
-        logger.info(f"Include Docs Context: {request.include_docs_context}")
-        logger.info("=" * 80)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("=" * 80)
+            logger.info("CODE GENERATION REQUEST")
+            logger.info("Prompt: %s", request.prompt)
+            logger.info("Frameworks: %s", request.frameworks)
+            logger.info("Include Docs Context: %s", request.include_docs_context)
+            logger.info("=" * 80)
 
-        # Convert history to dict format
-        history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in request.history
-        ]
+        # Convert history to dict format in a single serializer pass
+        history = request.model_dump(include={"history"})["history"]
 
         # Generate code
         code = await code_generation_service.generate_code(
@@ -46,10 +52,9 @@ async def generate_code(request: CodeGenerationRequest):
             include_docs_context=request.include_docs_context
         )
 
-        logger.info(f"Code generated ({len(code)} characters)")
+        logger.info("Code generated (%s characters)", len(code))
 
         # Update Langfuse trace
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             input={
                 "prompt": request.prompt,
@@ -76,7 +81,6 @@ async def generate_code(request: CodeGenerationRequest):
         )
 
     except Exception as e:
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             output={"error": str(e)},
             metadata={"error_type": type(e).__name__}
@@ -84,35 +88,119 @@ async def generate_code(request: CodeGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/upload", response_model=CodeGenerationResponse)
+@router.post("/stream")
 @observe()
-async def generate_code_with_files(
-    prompt: str = Form(""),
-    frameworks: str = Form("[]"),
-    history: str = Form("[]"),
-    include_docs_context: str = Form("true"),
-    files: List[UploadFile] = File(default=[])
-):
+async def generate_code_stream(request: CodeGenerationRequest):
+    """
+    Streaming code generation endpoint.
+
+    Streams generated code as server-sent events: one `data` frame per
+    text delta, then a terminal `done` event with the trace ID.
+    Failures after the stream has started are sent as an `error` event.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("=" * 80)
+        logger.info("STREAMING CODE GENERATION REQUEST")
+        logger.info("Prompt: %s", request.prompt)
+        logger.info("Frameworks: %s", request.frameworks)
+        logger.info("Include Docs Context: %s", request.include_docs_context)
+        logger.info("=" * 80)
+
+    # Convert history to dict format in a single serializer pass
+    history = request.model_dump(include={"history"})["history"]
+
+    async def event_stream():
+        try:
+            search_results = []
+            if request.include_docs_context and request.frameworks:
+                search_results = await code_generation_service.retrieve(
+                    request.prompt, request.frameworks
+                )
+
+            code_parts = []
+            async for delta in code_generation_service.stream_from_context(
+                request.prompt, search_results, history
+            ):
+                code_parts.append(delta)
+                yield sse_event({"delta": delta})
+
+            code = "".join(code_parts)
+            logger.info("Code streamed (%s characters)", len(code))
+
+            # Update Langfuse trace
+            langfuse_client.update_current_trace(
+                input={
+                    "prompt": request.prompt,
+                    "frameworks": request.frameworks,
+                    "include_docs_context": request.include_docs_context,
+                },
+                output={
+                    "code": code[:500],
+                    "code_length": len(code),
+                },
+                metadata={
+                    "frameworks": request.frameworks,
+                    "prompt_length": len(request.prompt),
+                    "history_length": len(request.history),
+                    "include_docs_context": request.include_docs_context,
+                    "streaming": True,
+                }
+            )
+
+            trace_id = langfuse_client.get_current_trace_id()
+
+            yield sse_event({"trace_id": trace_id}, event="done")
+
+        except Exception as e:
+            logger.error("Error in generate_code_stream: %s", e)
+            langfuse_client.update_current_trace(
+                output={"error": str(e)},
+                metadata={"error_type": type(e).__name__}
+            )
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/upload", response_model=CodeGenerationResponse)
+@observe(capture_input=False)
+async def generate_code_with_files(request: Request):
     """
     Code generation endpoint with file upload support.
 
     Processes uploaded files and includes their content as context for code generation.
+
+    Expects a multipart/form-data body; see parse_multipart_form().
     """
+    files = []
     try:
+        # Stream the multipart body, rejecting oversized files early
+        form, files = await parse_multipart_form(request)
+        prompt = form.get("prompt", "")
+
         # Parse JSON strings
-        frameworks_list = json.loads(frameworks)
-        history_list = json.loads(history)
-        include_docs = include_docs_context.lower() == "true"
+        frameworks_list = orjson.loads(form.get("frameworks", "[]"))
+        history_list = orjson.loads(form.get("history", "[]"))
+        include_docs = form.get("include_docs_context", "true").lower() == "true"
 
-        logger.info("=" * 80)
-        logger.info(f"CODE GENERATION WITH FILES")
-        logger.info(f"Prompt: {prompt}")
-        logger.info(f"Frameworks: {frameworks_list}")
-        logger.info(f"Files: {[f.filename for f in files]}")
-        logger.info("=" * 80)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("=" * 80)
+            logger.info("CODE GENERATION WITH FILES")
+            logger.info("Prompt: %s", prompt)
+            logger.info("Frameworks: %s", frameworks_list)
+            logger.info("Files: %s", [f.filename for f in files])
+            logger.info("=" * 80)
 
-        # Process uploaded files
-        file_content = await process_uploaded_files(files)
+        # Retrieval only needs the prompt, so run it while files are processed
+        use_docs = include_docs and bool(frameworks_list)
+        search_results = None
+        if use_docs and prompt:
+            search_results, file_content = await asyncio.gather(
+                code_generation_service.retrieve(prompt, frameworks_list),
+                process_uploaded_files(files)
+            )
+        else:
+            file_content = await process_uploaded_files(files)
         file_context = format_file_context(file_content)
 
         # Combine prompt with file context
@@ -120,18 +208,22 @@ async def generate_code_with_files(
         if file_context:
             enhanced_prompt = f"{file_context}\n\nUser request: {prompt}" if prompt else file_context
 
+        # Without a prompt, retrieve against the file content instead
+        if search_results is None:
+            search_results = []
+            if use_docs:
+                search_results = await code_generation_service.retrieve(enhanced_prompt, frameworks_list)
+
         # Generate code
-        code = await code_generation_service.generate_code(
+        code = await code_generation_service.generate_from_context(
             prompt=enhanced_prompt,
-            frameworks=frameworks_list,
-            history=history_list,
-            include_docs_context=include_docs
+            search_results=search_results,
+            history=history_list
         )
 
-        logger.info(f"Code generated ({len(code)} characters)")
+        logger.info("Code generated (%s characters)", len(code))
 
         # Update Langfuse trace
-        langfuse_client = get_client()
         langfuse_client.update_current_trace(
             input={
                 "prompt": prompt,
@@ -159,13 +251,22 @@ async def generate_code_with_files(
             trace_id=trace_id
         )
 
-    except json.JSONDecodeError as e:
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"Upload too large: {str(e)}")
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        # Nobody is left to read a response; skip error logging and tracing
+        logger.info("Client disconnected during upload")
+        return Response(status_code=499)  # Client Closed Request
+    except orjson.JSONDecodeError as e:
         raise HTTPException(status_code=422, detail=f"Invalid JSON: {str(e)}")
     except Exception as e:
-        logger.error(f"Error in generate_code_with_files: {e}")
-        langfuse_client = get_client()
+        logger.error("Error in generate_code_with_files: %s", e)
         langfuse_client.update_current_trace(
             output={"error": str(e)},
             metadata={"error_type": type(e).__name__}
         )
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await close_uploaded_files(files)
@@ -1,7 +1,9 @@
 """Health check endpoint."""
+import time
 from fastapi import APIRouter
 from datetime import datetime
 from app.services.pinecone_service import pinecone_service
+from app.services import concurrency
 
 router = APIRouter(tags=["health"])
 
@@ -10,8 +12,8 @@ router = APIRouter(tags=["health"])
 async def health_check():
     """Health check endpoint."""
     try:
-        # Get Pinecone stats to verify connection
-        stats = pinecone_service.get_stats()
+        # Get Pinecone stats to verify connection (cached by the service)
+        stats = await pinecone_service.get_stats()
 
         return {
             "status": "healthy",
@@ -21,9 +23,27 @@ async def health_check():
                 "connected": True,
                 "total_vectors": stats.get("total_vectors", 0),
                 "dimension": stats.get("dimension", 0)
-            }
+            },
+            "concurrency": concurrency.get_stats()
         }
     except Exception as e:
+        fetched_at, stats = pinecone_service.last_stats
+        if stats is not None:
+            # Report the last known stats rather than failing outright
+            return {
+                "status": "degraded",
+                "timestamp": datetime.utcnow().isoformat(),
+                "service": "devdocs-backend",
+                "pinecone": {
+                    "connected": False,
+                    "total_vectors": stats.get("total_vectors", 0),
+                    "dimension": stats.get("dimension", 0),
+                    "stats_age": round(time.monotonic() - fetched_at, 1)
+                },
+                "concurrency": concurrency.get_stats(),
+                "error": str(e)
+            }
+
         return {
             "status": "unhealthy",
             "timestamp": datetime.utcnow().isoformat(),
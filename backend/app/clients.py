@@ -0,0 +1,44 @@
+"""Shared provider SDK clients."""
+import httpx
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+from pinecone import Pinecone
+from app.config import settings
+from app.http_client import create_http_client
+
+
+class Clients:
+    """
+    Container for the OpenAI, Anthropic and Pinecone clients.
+
+    The OpenAI and Anthropic SDK clients share one pooled HTTP/2 client, so
+    their requests reuse the same keepalive connections instead of each SDK
+    maintaining a separate pool.
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient):
+        """Build the SDK clients on top of a shared HTTP client."""
+        self.http_client = http_client
+
+        # Used for both chat completions and embeddings
+        self.openai = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=http_client,
+            max_retries=settings.llm_max_retries
+        )
+        self.anthropic = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            http_client=http_client,
+            max_retries=settings.llm_max_retries
+        )
+        self.pinecone = Pinecone(api_key=settings.pinecone_api_key)
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP connection pool."""
+        # The SDK clients don't own the pool; their close() would just close
+        # this same httpx client again
+        await self.http_client.aclose()
+
+
+# Global clients instance; closed by the application lifespan
+clients = Clients(http_client=create_http_client())
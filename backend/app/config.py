@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     # <- Use Render's PORT environment variable or fallback to 8000 locally
     app_port: int = int(os.environ.get("PORT", 8000))
     cors_origins: str = ""  # Comma-separated list of allowed origins for production
+    workers: int = min((os.cpu_count() or 1) * 2 + 1, 8)  # Uvicorn workers outside dev
 
     # Models
     embedding_model: str = "text-embedding-3-small"
@@ -33,9 +34,24 @@ class Settings(BaseSettings):
 
     # RAG
     similarity_top_k: int = 5
+    max_chars_per_source: int = 2000  # Source text kept per search result
     chunk_size: int = 1024
     chunk_overlap: int = 200
 
+    # Outbound concurrency per worker, and SDK retries (with backoff) on 429s
+    openai_max_concurrency: int = 32
+    openai_embed_max_concurrency: int = 16  # Rate-limited separately from chat
+    anthropic_max_concurrency: int = 8
+    pinecone_max_concurrency: int = 16
+    llm_max_retries: int = 4
+
+    # Caching
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl: int = 6 * 3600  # seconds
+    query_cache_size: int = 512
+    query_cache_threshold: float = 0.95
+    query_cache_ttl: int = 12 * 3600  # seconds
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,28 @@
+"""HTTP client configuration for the LLM provider SDKs."""
+import httpx
+
+# Connection pool sized for many concurrent streaming LLM calls per worker
+HTTP_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=128)
+HTTP_TIMEOUT = 60.0  # seconds; the SDKs override this per request
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create the pooled HTTP/2 client shared by the OpenAI and Anthropic SDKs.
+
+    HTTP/2 multiplexes concurrent requests to the same API host over a few
+    connections instead of opening one per in-flight request.
+
+    Returns:
+        Configured httpx.AsyncClient
+    """
+    # Pool settings belong on the transport; httpx ignores the client-level
+    # limits and http2 arguments when a transport is given
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        transport=httpx.AsyncHTTPTransport(
+            limits=HTTP_LIMITS,
+            http2=True,
+            retries=2  # Connection-level retries; the SDKs retry API errors
+        )
+    )
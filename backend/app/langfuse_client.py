@@ -9,5 +9,9 @@ langfuse = Langfuse(
     host=settings.langfuse_host,
 )
 
+# Shared client for trace updates; trace state lives in the OpenTelemetry
+# context, so one instance serves every request
+client = get_client()
+
 # Export for use in other modules
-__all__ = ["langfuse", "observe", "get_client"]
+__all__ = ["langfuse", "client", "observe", "get_client"]
@@ -14,7 +14,7 @@ class SourceNode(BaseModel):
     id: str
     text: str
     score: float
-    metadata: Dict[str, Any]
+    metadata: Dict[str, Any] = {}
     url: Optional[str] = None
     framework: Optional[str] = None
 
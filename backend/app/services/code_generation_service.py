@@ -1,8 +1,22 @@
 """Code generation service using Claude."""
-from typing import List, Dict, Any, Optional
-from anthropic import Anthropic
+import io
+import logging
+from typing import List, Dict, Any, Optional, AsyncIterator
 from app.config import settings
+from app.clients import clients
 from app.services.pinecone_service import pinecone_service
+from app.services.streaming import collect_full, read_ahead
+from app.services.concurrency import anthropic_limit
+
+logger = logging.getLogger(__name__)
+
+# System prompts longer than this (roughly Claude's 1024-token minimum
+# cacheable prompt) get a prompt cache breakpoint
+CACHEABLE_PROMPT_CHARS = 4000
+
+# Fixed pieces of the documentation context
+_HEADER = "\n# RELEVANT DOCUMENTATION\n"
+_SEPARATOR = "=" * 80
 
 
 # System prompt for code generation
@@ -121,12 +135,13 @@ npm start
 REMEMBER: Generate a COMPLETE, MULTI-FILE application that someone can copy, install dependencies, and run immediately. NOT a single-file demo!"""
 
 
+
 class CodeGenerationService:
     """Service for generating code using Claude."""
 
     def __init__(self):
         """Initialize code generation service."""
-        self.client = Anthropic(api_key=settings.anthropic_api_key)
+        self.client = clients.anthropic
 
     async def generate_code(
         self,
@@ -148,26 +163,85 @@ class CodeGenerationService:
             Generated code with explanation
         """
         # Build context from documentation if requested
-        context = ""
+        search_results = []
         if include_docs_context and frameworks:
-            # Search for relevant documentation
-            search_results = pinecone_service.search(
-                query=prompt,
-                frameworks=frameworks,
-                top_k=3  # Fewer sources for code gen to keep prompt focused
-            )
-
-            if search_results:
-                context = self._build_context(search_results)
-
-        # Generate code using Claude Opus 4.5
-        response_text = await self._generate_with_claude(
+            search_results = await self.retrieve(prompt, frameworks)
+
+        return await self.generate_from_context(prompt, search_results, history)
+
+    async def retrieve(
+        self,
+        prompt: str,
+        frameworks: List[str],
+        *,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search documentation relevant to a code generation request.
+
+        Args:
+            prompt: User's code generation request
+            frameworks: List of frameworks to consider
+            query_vector: Embedding of prompt, if the caller already has it
+
+        Returns:
+            List of search results from Pinecone
+        """
+        # Search for relevant documentation
+        return await pinecone_service.search(
+            query=prompt,
+            frameworks=frameworks,
+            top_k=3,  # Fewer sources for code gen to keep prompt focused
+            query_vector=query_vector
+        )
+
+    async def generate_from_context(
+        self,
+        prompt: str,
+        search_results: List[Dict[str, Any]],
+        history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate code from already retrieved documentation.
+
+        Args:
+            prompt: User's code generation request
+            search_results: Search results from retrieve() (may be empty)
+            history: Previous conversation history (optional)
+
+        Returns:
+            Generated code with explanation
+        """
+        context = self._build_context(search_results) if search_results else ""
+
+        # Generate code using Claude, collecting the streamed deltas
+        return await collect_full(self._generate_with_claude(
             prompt=prompt,
             context=context,
             history=history
-        )
+        ))
+
+    async def stream_from_context(
+        self,
+        prompt: str,
+        search_results: List[Dict[str, Any]],
+        history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated code from already retrieved documentation.
+
+        Args:
+            prompt: User's code generation request
+            search_results: Search results from retrieve() (may be empty)
+            history: Previous conversation history (optional)
+
+        Yields:
+            Generated text deltas as they arrive from Claude
+        """
+        context = self._build_context(search_results) if search_results else ""
 
-        return response_text
+        async for text in read_ahead(self._generate_with_claude(prompt, context, history)):
+            yield text
 
     def _build_context(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -182,39 +256,101 @@ class CodeGenerationService:
         if not results:
             return ""
 
-        context_parts = ["\n# RELEVANT DOCUMENTATION\n"]
+        buf = io.StringIO()
+        buf.write(_HEADER)
 
         for idx, result in enumerate(results, 1):
-            metadata = result.get("metadata", {})
-            text = result.get("text", "")
-            url = metadata.get("url", "")
             framework = result.get("framework", "")
 
-            context_parts.append(
-                f"\n## Source {idx} ({framework})\n"
-                f"URL: {url}\n"
-                f"\n{text}\n"
-                f"{'='*80}"
-            )
+            buf.write(f"\n\n## Source {idx} ({framework})\nURL: ")
+            buf.write(result.get("url", ""))
+            buf.write("\n\n")
+            buf.write(result.get("text", ""))
+            buf.write("\n")
+            buf.write(_SEPARATOR)
 
-        return "\n".join(context_parts)
+        return buf.getvalue()
 
     async def _generate_with_claude(
         self,
         prompt: str,
         context: str = "",
         history: List[Dict[str, str]] = None
-    ) -> str:
+    ) -> AsyncIterator[str]:
         """
-        Generate code using Claude.
+        Stream generated code from Claude.
 
         Args:
             prompt: User's code generation request
             context: Optional documentation context
             history: Previous conversation history
 
+        Yields:
+            Generated text deltas as they arrive
+        """
+        # Call Claude API (Claude Sonnet 4.5), holding a concurrency slot until the stream ends
+        async with anthropic_limit, self.client.messages.stream(
+            model=settings.code_model,  # claude-sonnet-4-5-20250929
+            max_tokens=16000,  # Increased for large multi-file applications
+            temperature=settings.temperature,
+            system=self._build_system(context),  # System prompt goes here for Claude
+            messages=self._build_messages(prompt, context, history)
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+            self._log_usage((await stream.get_final_message()).usage)
+
+    def _log_usage(self, usage) -> None:
+        """Log token usage, including prompt cache reads and writes."""
+        logger.info(
+            "Claude usage: %d input, %d cache read, %d cache write, %d output tokens",
+            usage.input_tokens,
+            usage.cache_read_input_tokens or 0,
+            usage.cache_creation_input_tokens or 0,
+            usage.output_tokens
+        )
+
+    def _build_system(self, context: str = "") -> List[Dict[str, Any]]:
+        """
+        Build the Claude system blocks for a code generation request.
+
+        Documentation context follows the system prompt here rather than in
+        the last user message, so the prefix stays the same across
+        follow-ups that retrieve the same docs. The breakpoint is only set
+        when the prefix is long enough for Claude to cache.
+
+        Args:
+            context: Optional documentation context
+
+        Returns:
+            List of Claude system content blocks
+        """
+        system = [{"type": "text", "text": CODE_GENERATION_SYSTEM_PROMPT}]
+        if context:
+            system.append({"type": "text", "text": context})
+
+        if len(CODE_GENERATION_SYSTEM_PROMPT) + len(context) > CACHEABLE_PROMPT_CHARS:
+            system[-1]["cache_control"] = {"type": "ephemeral"}
+
+        return system
+
+    def _build_messages(
+        self,
+        prompt: str,
+        context: str = "",
+        history: List[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the Claude messages for a code generation request.
+
+        Args:
+            prompt: User's code generation request
+            context: Optional documentation context, sent in the system blocks
+            history: Previous conversation history
+
         Returns:
-            Generated code response
+            List of Claude messages
         """
         # Build conversation messages for Claude (no system in messages array)
         messages = []
@@ -231,9 +367,7 @@ class CodeGenerationService:
 
         # Build user message with context if available
         if context:
-            user_message = f"""{context}
-
-# USER REQUEST
+            user_message = f"""# USER REQUEST
 
 {prompt}
 
@@ -262,17 +396,7 @@ Make it ready to copy, install, and run immediately."""
             "content": user_message
         })
 
-        # Call Claude API (Claude Sonnet 4.5)
-        response = self.client.messages.create(
-            model=settings.code_model,  # claude-sonnet-4-5-20250929
-            max_tokens=16000,  # Increased for large multi-file applications
-            temperature=settings.temperature,
-            system=CODE_GENERATION_SYSTEM_PROMPT,  # System prompt goes here for Claude
-            messages=messages
-        )
-
-        # Extract text from response
-        return response.content[0].text
+        return messages
 
 
 # Global service instance
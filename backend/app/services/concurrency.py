@@ -0,0 +1,58 @@
+"""Concurrency limits for outbound provider calls."""
+import asyncio
+from typing import Dict
+from app.config import settings
+
+
+class ProviderLimit:
+    """Caps concurrent calls to one provider and counts calls in flight."""
+
+    def __init__(self, limit: int):
+        """
+        Initialize provider limit.
+
+        Args:
+            limit: Maximum concurrent calls
+        """
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __aenter__(self) -> "ProviderLimit":
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+# One limit per provider, shared by every service in this worker
+openai_limit = ProviderLimit(settings.openai_max_concurrency)
+openai_embed_limit = ProviderLimit(settings.openai_embed_max_concurrency)
+anthropic_limit = ProviderLimit(settings.anthropic_max_concurrency)
+pinecone_limit = ProviderLimit(settings.pinecone_max_concurrency)
+
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Get current concurrency per provider.
+
+    Returns:
+        Dictionary of limit, in-flight and waiting counts keyed by provider
+    """
+    return {
+        name: {"limit": limit.limit, "in_flight": limit.in_flight, "waiting": limit.waiting}
+        for name, limit in (
+            ("openai", openai_limit),
+            ("openai_embeddings", openai_embed_limit),
+            ("anthropic", anthropic_limit),
+            ("pinecone", pinecone_limit),
+        )
+    }
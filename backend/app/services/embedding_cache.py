@@ -0,0 +1,94 @@
+"""In-memory cache for text embeddings."""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple, Optional
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Log hit rate every this many lookups
+STATS_LOG_INTERVAL = 500
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings with a per-entry TTL.
+
+    Keys are a SHA-256 digest of the embedding model, dimension and
+    normalized text, so a model or dimension change never serves stale
+    vectors. Vectors are kept as float32 arrays, the precision Pinecone
+    stores them at, which is about an eighth of the memory of a tuple of
+    Python floats.
+    """
+
+    def __init__(self):
+        """Initialize embedding cache."""
+        self.max_size = settings.embedding_cache_size
+        self.ttl = settings.embedding_cache_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """Hash the model, dimension and normalized text into a cache key."""
+        normalized = text.strip().lower()
+        raw = f"{settings.embedding_model}|{settings.embedding_dim}|{normalized}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up a cached embedding.
+
+        Args:
+            text: Text that was embedded
+
+        Returns:
+            Embedding if cached and not expired, otherwise None
+        """
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+            lookups = self.hits + self.misses
+            if lookups % STATS_LOG_INTERVAL == 0:
+                logger.info(
+                    "Embedding cache: %d hits, %d misses (%.1f%% hit rate), %d entries",
+                    self.hits, self.misses, 100 * self.hits / lookups, len(self._entries)
+                )
+
+        return None if entry is None else entry[1].tolist()
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        """
+        Cache an embedding, evicting the least recently used entry when full.
+
+        Args:
+            text: Text that was embedded
+            embedding: Embedding vector
+        """
+        key = self._key(text)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, np.asarray(embedding, dtype=np.float32))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+# Global cache instance
+embedding_cache = EmbeddingCache()
@@ -1,18 +1,184 @@
 """File processing service for handling uploaded files."""
+import asyncio
+import hashlib
 import io
 import logging
-from typing import List, Tuple
-from fastapi import UploadFile
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import IO, List, Tuple, Dict, Optional
+from fastapi import Request, UploadFile
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
 
 logger = logging.getLogger(__name__)
 
 # Supported file extensions
-SUPPORTED_EXTENSIONS = {
+SUPPORTED_EXTENSIONS = frozenset({
     ".txt", ".md", ".json", ".js", ".ts", ".tsx", ".jsx",
     ".py", ".css", ".html", ".xml", ".yaml", ".yml", ".csv", ".pdf"
-}
+})
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+READ_CHUNK_SIZE = 64 * 1024  # 64KB
+
+# Multipart upload limits, in line with Starlette's form parser defaults
+MAX_BODY_SIZE = 50 * 1024 * 1024  # 50MB across all parts
+MAX_FIELD_SIZE = 1024 * 1024  # 1MB per non-file field
+MAX_FILES = 20
+MAX_FIELDS = 50
+SPOOL_MAX_SIZE = 1024 * 1024  # File parts larger than 1MB spill to disk
+
+# Extracted PDF text keyed by content hash, so files re-sent in follow-up
+# turns skip parsing; most recently used last
+MAX_CACHED_PDFS = 128
+_pdf_text_cache: "OrderedDict[str, str]" = OrderedDict()
+_pdf_text_cache_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Raised when a multipart upload body is malformed."""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when a multipart upload exceeds a size or part count limit."""
+
+
+class _MultipartCollector:
+    """Collects form fields and files from MultipartParser callbacks."""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.files: List[UploadFile] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = ""
+        self._filename: Optional[str] = None
+        self._buffer: Optional[IO[bytes]] = None
+        self._max_size = MAX_FIELD_SIZE
+
+    def callbacks(self) -> dict:
+        """Return the callback mapping for MultipartParser."""
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def close(self) -> None:
+        """Release any spooled file buffers."""
+        for file in self.files:
+            file.file.close()
+        if self._buffer is not None:
+            self._buffer.close()
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        self._filename = filename.decode("utf-8", errors="replace") if filename is not None else None
+
+        if self._filename is None:
+            if len(self.fields) >= MAX_FIELDS:
+                raise UploadTooLargeError(f"more than {MAX_FIELDS} form fields")
+            self._buffer = io.BytesIO()
+            self._max_size = MAX_FIELD_SIZE
+        else:
+            if len(self.files) >= MAX_FILES:
+                raise UploadTooLargeError(f"more than {MAX_FILES} files")
+            # Small files stay in memory; larger ones spill to a temporary file
+            self._buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+            self._max_size = MAX_FILE_SIZE
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        # Reject as soon as the budget is exceeded instead of after buffering
+        if self._buffer.tell() + (end - start) > self._max_size:
+            raise UploadTooLargeError(
+                f"{self._filename or self._name} exceeds the {self._max_size} byte limit"
+            )
+        self._buffer.write(data[start:end])
+
+    def on_part_end(self) -> None:
+        buffer, self._buffer = self._buffer, None
+        if self._filename is None:
+            try:
+                self.fields[self._name] = buffer.getvalue().decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise UploadError(f"Form field '{self._name}' is not valid UTF-8") from e
+            return
+
+        size = buffer.tell()
+        buffer.seek(0)
+        self.files.append(UploadFile(file=buffer, size=size, filename=self._filename))
+
+
+async def parse_multipart_form(request: Request) -> Tuple[Dict[str, str], List[UploadFile]]:
+    """
+    Parse a multipart/form-data body as it streams in.
+
+    File parts up to SPOOL_MAX_SIZE are kept in memory and larger ones are
+    spooled to temporary files. The upload is aborted as soon as it breaks
+    a size or part count limit. URL-encoded bodies are accepted too, for
+    requests that carry no files.
+
+    Returns:
+        Tuple of (form fields, uploaded files)
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"application/x-www-form-urlencoded":
+        form = await request.form()
+        return {key: value for key, value in form.items() if isinstance(value, str)}, []
+
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected a multipart/form-data or URL-encoded body")
+
+    collector = _MultipartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+
+    try:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_BODY_SIZE:
+                raise UploadTooLargeError(f"request body exceeds the {MAX_BODY_SIZE} byte limit")
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError as e:
+        collector.close()
+        raise UploadError(f"Malformed multipart body: {e}") from e
+    except BaseException:
+        # Includes ClientDisconnect and cancellation, which would leak spooled files
+        collector.close()
+        raise
+
+    return collector.fields, collector.files
+
+
+async def close_uploaded_files(files: List[UploadFile]) -> None:
+    """Close uploaded files, removing any spooled temporary files."""
+    for file in files:
+        await file.close()
 
 
 async def extract_text_from_file(file: UploadFile) -> Tuple[str, str]:
@@ -26,14 +192,23 @@ async def extract_text_from_file(file: UploadFile) -> Tuple[str, str]:
     ext = "." + filename.split(".")[-1].lower() if "." in filename else ""
 
     if ext not in SUPPORTED_EXTENSIONS:
-        logger.warning(f"Unsupported file type: {ext}")
+        logger.warning("Unsupported file type: %s", ext)
         return filename, f"[Unsupported file type: {ext}]"
 
-    try:
-        content = await file.read()
+    # Sizes are known up front for parsed uploads, so skip reading oversized ones
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        return filename, f"[File too large: {file.size} bytes, max {MAX_FILE_SIZE} bytes]"
 
-        if len(content) > MAX_FILE_SIZE:
-            return filename, f"[File too large: {len(content)} bytes, max {MAX_FILE_SIZE} bytes]"
+    try:
+        # Read in chunks, stopping as soon as the size limit is passed
+        chunks = []
+        total = 0
+        while chunk := await file.read(READ_CHUNK_SIZE):
+            total += len(chunk)
+            if total > MAX_FILE_SIZE:
+                return filename, f"[File too large: over {MAX_FILE_SIZE} bytes]"
+            chunks.append(chunk)
+        content = b"".join(chunks)
 
         # Handle PDF files
         if ext == ".pdf":
@@ -52,32 +227,55 @@ async def extract_text_from_file(file: UploadFile) -> Tuple[str, str]:
         return filename, text
 
     except Exception as e:
-        logger.error(f"Error extracting text from {filename}: {e}")
+        logger.error("Error extracting text from %s: %s", filename, e)
         return filename, f"[Error reading file: {str(e)}]"
 
 
 async def extract_pdf_text(content: bytes) -> str:
-    """Extract text from PDF content."""
+    """Extract text from PDF content in a worker thread, off the event loop."""
+    key = hashlib.blake2b(content, digest_size=16).hexdigest()
+    with _pdf_text_cache_lock:
+        text = _pdf_text_cache.get(key)
+        if text is not None:
+            _pdf_text_cache.move_to_end(key)
+
+    if text is not None:
+        logger.info("PDF text cache hit (%s bytes)", len(content))
+        return text
+
+    logger.info("PDF text cache miss (%s bytes)", len(content))
     try:
-        try:
-            from PyPDF2 import PdfReader
-            pdf_file = io.BytesIO(content)
-            reader = PdfReader(pdf_file)
+        text = await asyncio.to_thread(_parse_pdf, content)
 
-            text_parts = []
-            for page_num, page in enumerate(reader.pages, 1):
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(f"--- Page {page_num} ---\n{page_text}")
+    except Exception as e:
+        logger.error("Error extracting PDF text: %s", e)
+        return f"[Error parsing PDF: {str(e)}]"
 
-            return "\n\n".join(text_parts) if text_parts else "[No text found in PDF]"
+    with _pdf_text_cache_lock:
+        _pdf_text_cache[key] = text
+        _pdf_text_cache.move_to_end(key)
+        if len(_pdf_text_cache) > MAX_CACHED_PDFS:
+            _pdf_text_cache.popitem(last=False)
 
-        except ImportError:
-            return "[PDF parsing not available - install PyPDF2]"
+    return text
 
-    except Exception as e:
-        logger.error(f"Error extracting PDF text: {e}")
-        return f"[Error parsing PDF: {str(e)}]"
+
+def _parse_pdf(content: bytes) -> str:
+    """Extract text from PDF content (CPU-bound)."""
+    try:
+        from PyPDF2 import PdfReader
+    except ImportError:
+        return "[PDF parsing not available - install PyPDF2]"
+
+    reader = PdfReader(io.BytesIO(content))
+
+    text_parts = []
+    for page_num, page in enumerate(reader.pages, 1):
+        page_text = page.extract_text()
+        if page_text:
+            text_parts.append(f"--- Page {page_num} ---\n{page_text}")
+
+    return "\n\n".join(text_parts) if text_parts else "[No text found in PDF]"
 
 
 async def process_uploaded_files(files: List[UploadFile]) -> str:
@@ -90,11 +288,12 @@ async def process_uploaded_files(files: List[UploadFile]) -> str:
     if not files:
         return ""
 
-    file_contents = []
+    # Extract all files concurrently; PDFs parse in worker threads
+    extracted = await asyncio.gather(*(extract_text_from_file(file) for file in files))
 
-    for file in files:
-        filename, text = await extract_text_from_file(file)
+    file_contents = []
 
+    for filename, text in extracted:
         # Truncate very long files
         max_chars = 50000
         if len(text) > max_chars:
@@ -103,7 +302,7 @@ async def process_uploaded_files(files: List[UploadFile]) -> str:
         file_contents.append(f"=== File: {filename} ===\n{text}\n")
 
     combined = "\n".join(file_contents)
-    logger.info(f"Processed {len(files)} files, total {len(combined)} chars")
+    logger.info("Processed %s files, total %s chars", len(files), len(combined))
 
     return combined
 
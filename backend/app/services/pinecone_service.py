@@ -1,8 +1,22 @@
 """Pinecone vector database service."""
-from typing import List, Dict, Any, Optional
-from pinecone import Pinecone
-from openai import OpenAI
+import asyncio
+import heapq
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
+from app.clients import clients
+from app.services.embedding_cache import embedding_cache
+from app.services.concurrency import openai_embed_limit, pinecone_limit
+
+logger = logging.getLogger(__name__)
+
+# Single-text embedding requests arriving within this window share one API call
+EMBED_BATCH_WINDOW = 0.005  # seconds
+EMBED_BATCH_MAX = 64
+
+# Seconds to reuse index stats between describe_index_stats calls
+STATS_TTL = 30.0
 
 
 class PineconeService:
@@ -11,42 +25,144 @@ class PineconeService:
     def __init__(self):
         """Initialize Pinecone and OpenAI clients."""
         # Initialize Pinecone
-        self.pc = Pinecone(api_key=settings.pinecone_api_key)
+        self.pc = clients.pinecone
         self.index = self.pc.Index(settings.pinecone_index_name)
 
-        # Initialize OpenAI for embeddings
-        self.openai = OpenAI(api_key=settings.openai_api_key)
+        # OpenAI for embeddings
+        self.openai = clients.openai
+
+        # Micro-batcher state: texts waiting for the next flush
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: set = set()
+
+        # (monotonic time fetched, stats) from the last describe_index_stats call
+        self._stats_cache: Tuple[float, Optional[Dict[str, Any]]] = (0.0, None)
 
-    def create_embedding(self, text: str) -> List[float]:
+    async def create_embedding(self, text: str) -> List[float]:
         """
         Create embedding for text using OpenAI.
 
+        Cache misses are queued for a few milliseconds so concurrent
+        requests are embedded together in one API call.
+
         Args:
             text: Text to embed
 
         Returns:
             List of floats representing the embedding
         """
-        response = self.openai.embeddings.create(
-            model=settings.embedding_model,
-            input=text,
-            dimensions=settings.embedding_dim
-        )
-        return response.data[0].embedding
+        cached = embedding_cache.get(text)
+        if cached is not None:
+            return cached
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= EMBED_BATCH_MAX:
+            self._flush_pending()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                EMBED_BATCH_WINDOW, self._flush_pending
+            )
+
+        return await future
+
+    async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Create embeddings for several texts with one OpenAI call.
+
+        Cached texts are skipped and duplicates are sent once. The
+        single-text micro-batcher flushes through here too.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embeddings in the same order as texts
+        """
+        embeddings = [embedding_cache.get(text) for text in texts]
+        misses = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
 
-    def search(
+        if misses:
+            fetched = dict(zip(misses, await self._request_embeddings(misses)))
+            embeddings = [e if e is not None else fetched[t] for t, e in zip(texts, embeddings)]
+
+        return embeddings
+
+    async def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with a single API call and cache the results.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embeddings in the same order as texts
+        """
+        async with openai_embed_limit:
+            response = await self.openai.embeddings.create(
+                model=settings.embedding_model,
+                input=texts,
+                dimensions=settings.embedding_dim
+            )
+
+        embeddings = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+        for text, embedding in zip(texts, embeddings):
+            embedding_cache.put(text, embedding)
+        return embeddings
+
+    def _flush_pending(self) -> None:
+        """Send up to EMBED_BATCH_MAX queued texts as one embedding request."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        batch = self._pending[:EMBED_BATCH_MAX]
+        self._pending = self._pending[EMBED_BATCH_MAX:]
+        if self._pending:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                EMBED_BATCH_WINDOW, self._flush_pending
+            )
+
+        task = asyncio.get_running_loop().create_task(self._embed_batch(batch))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Embed a flushed batch and resolve each waiting request."""
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embeddings = dict(zip(texts, await self.create_embeddings(texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, future in batch:
+            if not future.done():
+                future.set_result(embeddings[text])
+
+    async def search(
         self,
         query: str,
         frameworks: List[str],
-        top_k: int = None
+        top_k: int = None,
+        *,
+        query_vector: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search Pinecone for relevant documentation across framework namespaces.
 
+        Namespaces are queried concurrently; the Pinecone client is sync, so
+        each query runs in a worker thread.
+
         Args:
             query: Search query text
             frameworks: List of framework namespaces to search
             top_k: Number of results to return per framework (default from settings)
+            query_vector: Embedding of query, if the caller already has it
 
         Returns:
             List of matching documents with metadata and scores, sorted by relevance
@@ -54,53 +170,78 @@ class PineconeService:
         if top_k is None:
             top_k = settings.similarity_top_k
 
-        # Create query embedding once
-        query_embedding = self.create_embedding(query)
+        # Create query embedding once, unless the caller passed it in
+        query_embedding = query_vector
+        if query_embedding is None:
+            query_embedding = await self.create_embedding(query)
 
         # Query each framework namespace separately and collect all results
-        all_results = []
-        for framework in frameworks:
-            try:
-                # Query specific framework namespace
-                results = self.index.query(
-                    vector=query_embedding,
-                    namespace=framework,  # Query framework-specific namespace!
-                    top_k=top_k,
-                    include_metadata=True,
-                )
+        responses = await asyncio.gather(
+            *(self._query_namespace(query_embedding, framework, top_k) for framework in frameworks),
+            return_exceptions=True
+        )
 
-                # Format and add results
-                for match in results.matches:
-                    all_results.append({
-                        "id": match.id,
-                        "score": float(match.score),
-                        "metadata": match.metadata,
-                        "text": match.metadata.get("content", ""),
-                        "url": match.metadata.get("url", ""),
-                        "framework": framework,  # Use namespace as framework
-                    })
-            except Exception as e:
+        all_results = []
+        for framework, results in zip(frameworks, responses):
+            if isinstance(results, Exception):
                 # Log but don't fail if one namespace query fails
-                print(f"Warning: Error querying namespace '{framework}': {e}")
+                logger.warning(
+                    "Error querying namespace '%s': %s", framework, results,
+                    extra={"namespace": framework, "error": str(results)}
+                )
                 continue
 
-        # Sort all results by score (highest first) and limit to top_k total
-        all_results.sort(key=lambda x: x["score"], reverse=True)
-        return all_results[:top_k]
-
-    def get_stats(self) -> Dict[str, Any]:
+            # Format and add results
+            for match in results.matches:
+                # Keep only the fields the pipeline uses, with the text capped
+                all_results.append({
+                    "id": match.id,
+                    "score": float(match.score),
+                    "text": (match.metadata.get("content") or "")[:settings.max_chars_per_source],
+                    "url": match.metadata.get("url", ""),
+                    "framework": framework,  # Use namespace as framework
+                })
+
+        # Keep the top_k highest-scoring results overall, without sorting the rest
+        return heapq.nlargest(top_k, all_results, key=lambda x: x["score"])
+
+    async def _query_namespace(self, vector: List[float], framework: str, top_k: int):
+        """Query one framework namespace in a worker thread; the Pinecone client is sync."""
+        async with pinecone_limit:
+            return await asyncio.to_thread(
+                self.index.query,
+                vector=vector,
+                namespace=framework,  # Query framework-specific namespace!
+                top_k=top_k,
+                include_metadata=True,
+            )
+
+    async def get_stats(self) -> Dict[str, Any]:
         """
-        Get index statistics.
+        Get index statistics, reusing the last result for up to STATS_TTL seconds.
 
         Returns:
             Dictionary with index stats
         """
-        stats = self.index.describe_index_stats()
-        return {
+        fetched_at, cached = self._stats_cache
+        if cached is not None and time.monotonic() - fetched_at < STATS_TTL:
+            return cached
+
+        async with pinecone_limit:
+            stats = await asyncio.to_thread(self.index.describe_index_stats)
+
+        result = {
             "total_vectors": stats.total_vector_count,
             "dimension": stats.dimension,
             "namespaces": stats.namespaces if hasattr(stats, 'namespaces') else {}
         }
+        self._stats_cache = (time.monotonic(), result)
+        return result
+
+    @property
+    def last_stats(self) -> Tuple[float, Optional[Dict[str, Any]]]:
+        """(monotonic time fetched, stats) from the last successful get_stats call."""
+        return self._stats_cache
 
 
 # Global service instance
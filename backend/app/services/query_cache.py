@@ -0,0 +1,131 @@
+"""Response cache for documentation Q&A."""
+import time
+from typing import List, Tuple, Dict, Any, Optional
+import numpy as np
+from app.config import settings
+
+
+class QueryCache:
+    """
+    Two-tier in-memory cache of answers.
+
+    The exact tier matches the normalized question text; the semantic tier
+    matches questions whose embeddings are within the similarity threshold.
+    Both tiers share one preallocated ring buffer of slots, so the oldest
+    entry is overwritten when the cache is full.
+    """
+
+    def __init__(self):
+        """Initialize the preallocated ring buffer."""
+        self.max_size = settings.query_cache_size
+        self.threshold = settings.query_cache_threshold
+        self.ttl = settings.query_cache_ttl
+
+        # Exact tier: (normalized question, frameworks) -> slot
+        self._exact: Dict[tuple, int] = {}
+
+        # Parallel arrays indexed by slot; an expiry of 0 marks an empty slot
+        self._embeddings = np.zeros((self.max_size, settings.embedding_dim), dtype=np.float32)
+        self._contexts = np.zeros(self.max_size, dtype=np.int64)
+        self._expires = np.zeros(self.max_size, dtype=np.float64)
+        self._keys: List[Optional[tuple]] = [None] * self.max_size
+        self._payloads: List[Optional[Tuple[str, List[Dict[str, Any]]]]] = [None] * self.max_size
+        self._next = 0
+
+    @staticmethod
+    def _exact_key(question: str, frameworks: List[str]) -> tuple:
+        """Build the exact-tier key from the normalized question and frameworks."""
+        return " ".join(question.lower().split()), tuple(sorted(frameworks))
+
+    def get_exact(
+        self,
+        question: str,
+        frameworks: List[str]
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Find a cached answer for the same question.
+
+        Args:
+            question: User's question
+            frameworks: Framework namespaces searched
+
+        Returns:
+            Tuple of (answer, sources) on a hit, otherwise None
+        """
+        slot = self._exact.get(self._exact_key(question, frameworks))
+        if slot is None or self._expires[slot] <= time.monotonic():
+            return None
+
+        return self._payloads[slot]
+
+    def get_similar(
+        self,
+        embedding: List[float],
+        frameworks: List[str]
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Find a cached answer for a semantically similar question.
+
+        Args:
+            embedding: Embedding of the incoming question
+            frameworks: Framework namespaces searched
+
+        Returns:
+            Tuple of (answer, sources) on a hit, otherwise None
+        """
+        query = self._normalize(embedding)
+        context = hash(tuple(sorted(frameworks)))
+
+        valid = (self._expires > time.monotonic()) & (self._contexts == context)
+        if not valid.any():
+            return None
+
+        scores = np.where(valid, self._embeddings @ query, -1.0)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        return self._payloads[best]
+
+    def store(
+        self,
+        question: str,
+        frameworks: List[str],
+        embedding: List[float],
+        answer: str,
+        sources: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Cache an answer, overwriting the oldest slot when full.
+
+        Args:
+            question: User's question
+            frameworks: Framework namespaces searched
+            embedding: Embedding of the question
+            answer: Generated answer
+            sources: Source documents used for the answer
+        """
+        slot = self._next
+        old_key = self._keys[slot]
+        if old_key is not None and self._exact.get(old_key) == slot:
+            del self._exact[old_key]
+
+        key = self._exact_key(question, frameworks)
+        self._exact[key] = slot
+        self._keys[slot] = key
+        self._embeddings[slot] = self._normalize(embedding)
+        self._contexts[slot] = hash(key[1])
+        self._expires[slot] = time.monotonic() + self.ttl
+        self._payloads[slot] = (answer, sources)
+        self._next = (slot + 1) % self.max_size
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+# Global cache instance
+query_cache = QueryCache()
@@ -0,0 +1,39 @@
+"""Query validation for deciding when documentation retrieval is needed."""
+import re
+
+# Greetings, thanks and goodbyes, which never need documentation context.
+# Short replies like "yes" or "ok" are left out: they often accept an offer
+# from the previous answer and need the normal RAG path with history.
+CONVERSATIONAL_PHRASES = frozenset({
+    "hi", "hello", "hey", "thanks", "thank you", "thanks a lot", "thank you so much",
+    "thx", "ty", "bye", "goodbye",
+})
+
+# Requests to rework the previous answer rather than ask something new
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(please |can you |could you )?"
+    r"(restate|rephrase|repeat|summari[sz]e|shorten|simplify|say|explain)"
+    r" (that|this|it)( again| more simply| in simpler terms| shorter)?$"
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def needs_retrieval(message: str) -> bool:
+    """
+    Check whether a chat message should be answered from the documentation.
+
+    Args:
+        message: User's chat message
+
+    Returns:
+        False for small talk and follow-ups on the previous answer, otherwise True
+    """
+    normalized = " ".join(_PUNCTUATION.sub("", message.lower()).split())
+    if not normalized:
+        return True
+
+    if normalized in CONVERSATIONAL_PHRASES:
+        return False
+
+    return FOLLOW_UP_PATTERN.match(normalized) is None
@@ -1,8 +1,19 @@
 """RAG service for documentation Q&A."""
-from typing import List, Tuple, Dict, Any
-from openai import OpenAI
+import asyncio
+import io
+import logging
+from typing import List, Tuple, Dict, Any, AsyncIterator, Optional
 from app.config import settings
+from app.clients import clients
 from app.services.pinecone_service import pinecone_service
+from app.services.query_cache import query_cache
+from app.services.concurrency import openai_limit
+from app.services.streaming import collect_full, read_ahead
+
+logger = logging.getLogger(__name__)
+
+# Separator written between the context preamble and the sources
+_SEPARATOR = "=" * 80
 
 
 # System prompt for documentation Q&A
@@ -25,12 +36,23 @@ IMPORTANT: Use inline citations like [1], [2], [3] throughout your response, but
 Be helpful, technically accurate, and provide clear explanations."""
 
 
+# System prompt for messages answered without documentation lookup
+CONVERSATIONAL_SYSTEM_PROMPT = """You are an expert technical documentation assistant for developers.
+
+The user's message is conversational (a greeting, thanks, or a request to rework your previous answer).
+Reply briefly and naturally. When asked to restate, simplify, or summarize, work only from the earlier conversation.
+Do not introduce new technical claims or citations."""
+
+
 class RAGService:
     """Service for RAG-based documentation Q&A."""
 
     def __init__(self):
         """Initialize RAG service."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = clients.openai
+
+        # Pipeline runs in progress, so identical concurrent queries share one
+        self._inflight: Dict[tuple, asyncio.Future] = {}
 
     async def query(
         self,
@@ -49,20 +71,218 @@ class RAGService:
         Returns:
             Tuple of (answer, source_nodes)
         """
+        key = (
+            question,
+            tuple(frameworks),
+            tuple((msg["role"], msg["content"]) for msg in history or []),
+        )
+
+        # Wait on an identical query that is already running
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The original request went away mid-run; start over
+                return await self.query(question, frameworks, history)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # Reuse an answer to the same or a near-identical question
+            result = await self.lookup_cached(question, frameworks, history)
+            if result is None:
+                # Embed once for both the search and the cache entry
+                query_vector = await pinecone_service.create_embedding(question)
+                search_results = await self.retrieve(
+                    question, frameworks, query_vector=query_vector
+                )
+                answer = await self.generate_from_context(question, search_results, history)
+                await self.cache_answer(
+                    question, frameworks, history, answer, search_results,
+                    query_vector=query_vector
+                )
+                result = (answer, search_results)
+
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case no other request was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                future.cancel()
+
+    async def lookup_cached(
+        self,
+        question: str,
+        frameworks: List[str],
+        history: List[Dict[str, str]] = None
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Look up a cached answer, first by exact question then by similarity.
+
+        Questions asked mid-conversation are never served from the cache,
+        since their answer depends on the history.
+
+        Args:
+            question: User's question
+            frameworks: List of framework namespaces to search
+            history: Previous conversation history (optional)
+
+        Returns:
+            Tuple of (answer, source_nodes) on a hit, otherwise None
+        """
+        if history:
+            return None
+
+        cached = query_cache.get_exact(question, frameworks)
+        if cached is not None:
+            logger.info("Query cache hit (exact)")
+            return cached
+
+        # The embedding is cached, so the search that follows a miss reuses it
+        embedding = await pinecone_service.create_embedding(question)
+        cached = query_cache.get_similar(embedding, frameworks)
+        if cached is not None:
+            logger.info("Query cache hit (semantic)")
+        return cached
+
+    async def cache_answer(
+        self,
+        question: str,
+        frameworks: List[str],
+        history: List[Dict[str, str]],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        *,
+        query_vector: Optional[List[float]] = None
+    ) -> None:
+        """
+        Cache a generated answer for later lookup_cached() calls.
+
+        Args:
+            question: User's question
+            frameworks: List of framework namespaces searched
+            history: Previous conversation history
+            answer: Generated answer
+            sources: Search results the answer was generated from
+            query_vector: Embedding of question, if the caller already has it
+        """
+        if history:
+            return
+
+        if query_vector is None:
+            query_vector = await pinecone_service.create_embedding(question)
+        query_cache.store(question, frameworks, query_vector, answer, sources)
+
+    async def retrieve(
+        self,
+        question: str,
+        frameworks: List[str],
+        *,
+        query_vector: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search documentation relevant to a question.
+
+        Args:
+            question: User's question
+            frameworks: List of framework namespaces to search
+            query_vector: Embedding of question, if the caller already has it
+
+        Returns:
+            List of search results from Pinecone
+        """
         # Search Pinecone for relevant documentation
-        search_results = pinecone_service.search(
+        return await pinecone_service.search(
             query=question,
             frameworks=frameworks,
-            top_k=settings.similarity_top_k
+            top_k=settings.similarity_top_k,
+            query_vector=query_vector
         )
 
+    async def generate_from_context(
+        self,
+        question: str,
+        search_results: List[Dict[str, Any]],
+        history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate an answer from already retrieved documentation.
+
+        Args:
+            question: User's question
+            search_results: Search results from retrieve()
+            history: Previous conversation history (optional)
+
+        Returns:
+            Generated answer
+        """
         # Build context from search results
         context = self._build_context(search_results)
 
-        # Generate answer using Claude
-        answer = await self._generate_answer(question, context, history)
+        # Generate answer, collecting the streamed deltas
+        return await collect_full(self._generate_answer(question, context, history))
+
+    async def answer_no_context(
+        self,
+        question: str,
+        history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Answer a conversational message without searching the documentation.
+
+        Args:
+            question: User's message
+            history: Previous conversation history (optional)
+
+        Returns:
+            Generated answer
+        """
+        messages = [{"role": "system", "content": CONVERSATIONAL_SYSTEM_PROMPT}]
+        if history:
+            messages.extend(
+                {"role": msg["role"], "content": msg["content"]} for msg in history[-5:]
+            )
+        messages.append({"role": "user", "content": question})
+
+        async with openai_limit:
+            response = await self.client.chat.completions.create(
+                model=settings.doc_model,
+                max_tokens=1000,
+                temperature=settings.temperature,
+                messages=messages
+            )
+
+        return response.choices[0].message.content
+
+    async def stream_answer(
+        self,
+        question: str,
+        search_results: List[Dict[str, Any]],
+        history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer from already retrieved documentation.
+
+        Args:
+            question: User's question
+            search_results: Search results from retrieve()
+            history: Previous conversation history (optional)
+
+        Yields:
+            Answer text deltas as they are generated
+        """
+        context = self._build_context(search_results)
 
-        return answer, search_results
+        async for delta in read_ahead(self._generate_answer(question, context, history)):
+            yield delta
 
     def _build_context(self, results: List[Dict[str, Any]]) -> str:
         """
@@ -77,29 +297,63 @@ class RAGService:
         if not results:
             return "No relevant documentation found."
 
-        context_parts = []
+        # One buffer, so each source text is copied once
+        buf = io.StringIO()
+        buf.write("\n")
+        buf.write(_SEPARATOR)
         for i, result in enumerate(results, 1):
             framework = result.get("framework", "unknown")
-            url = result.get("url", "")
-            text = result.get("text", "")
             score = result.get("score", 0.0)
 
-            context_parts.append(
-                f"[Source {i} - {framework.upper()} - Relevance: {score:.2f}]\n"
-                f"URL: {url}\n"
-                f"Content:\n{text}\n"
-            )
+            if i > 1:
+                buf.write("\n")
+            buf.write(f"[Source {i} - {framework.upper()} - Relevance: {score:.2f}]\nURL: ")
+            buf.write(result.get("url", ""))
+            buf.write("\nContent:\n")
+            buf.write(result.get("text", ""))
+            buf.write("\n")
 
-        return "\n" + "="*80 + "\n".join(context_parts)
+        return buf.getvalue()
 
     async def _generate_answer(
         self,
         question: str,
         context: str,
         history: List[Dict[str, str]] = None
-    ) -> str:
+    ) -> AsyncIterator[str]:
+        """
+        Stream an answer using OpenAI GPT with context.
+
+        Args:
+            question: User's question
+            context: Documentation context from retrieval
+            history: Previous conversation history
+
+        Yields:
+            Answer text deltas as they are generated
+        """
+        # Call OpenAI API, holding a concurrency slot until the stream ends
+        async with openai_limit:
+            stream = await self.client.chat.completions.create(
+                model=settings.doc_model,  # Use configured OpenAI model (gpt-4o)
+                max_tokens=2000,
+                temperature=settings.temperature,
+                messages=self._build_messages(question, context, history),
+                stream=True
+            )
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def _build_messages(
+        self,
+        question: str,
+        context: str,
+        history: List[Dict[str, str]] = None
+    ) -> List[Dict[str, str]]:
         """
-        Generate answer using OpenAI GPT with context.
+        Build the chat completion messages for a question.
 
         Args:
             question: User's question
@@ -107,7 +361,7 @@ class RAGService:
             history: Previous conversation history
 
         Returns:
-            Generated answer
+            List of OpenAI chat messages
         """
         # Build conversation messages
         messages = [
@@ -137,18 +391,7 @@ Use inline citations [1], [2], etc. to reference sources, but do NOT include a "
             "content": user_message
         })
 
-        # Call OpenAI API
-        response = self.client.chat.completions.create(
-            model=settings.doc_model,  # Use configured OpenAI model (gpt-4o)
-            max_tokens=2000,
-            temperature=settings.temperature,
-            messages=messages
-        )
-
-        # Extract text from response
-        answer = response.choices[0].message.content
-
-        return answer
+        return messages
 
 
 # Global service instance
@@ -0,0 +1,64 @@
+"""Helpers for streamed LLM responses."""
+import asyncio
+from contextlib import suppress
+from typing import AsyncIterator
+import orjson
+
+# Marks the end of a read-ahead stream
+_END = object()
+
+
+async def collect_full(chunks: AsyncIterator[str]) -> str:
+    """
+    Drain a text stream into a single string.
+
+    Args:
+        chunks: Async iterator of text deltas
+
+    Returns:
+        Concatenated text
+    """
+    return "".join([chunk async for chunk in chunks])
+
+
+async def read_ahead(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Read a text stream in a background task, buffering it for the consumer.
+
+    The provider stream, and any concurrency slot it holds, is drained as
+    fast as the provider sends instead of at the pace of a slow client.
+
+    Args:
+        chunks: Async iterator of text deltas
+
+    Yields:
+        The same text deltas
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(_END)
+
+    task = asyncio.create_task(pump())
+    try:
+        while (item := await queue.get()) is not _END:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stops the provider stream early if the consumer went away
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def sse_event(data: dict, event: str = None) -> bytes:
+    """Format a server-sent event frame."""
+    frame = b"data: " + orjson.dumps(data) + b"\n\n"
+    return f"event: {event}\n".encode() + frame if event else frame
@@ -1,14 +1,83 @@
 """FastAPI application entry point."""
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings, SUPPORTED_FRAMEWORKS
+from app.clients import clients
 from app.api.routers import health, chat, generate
+from app.services.rag_service import rag_service
+from app.services.pinecone_service import pinecone_service
+
+# Configure logging once for the whole app
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Seconds before warm-up gives up on slow providers
+WARM_UP_TIMEOUT = 10.0
+
+
+async def warm_up():
+    """
+    Open connections to Pinecone and OpenAI ahead of user traffic.
+
+    Runs one retrieval per framework namespace plus an index stats call.
+    The LLM is not called, so warm-up costs no completion tokens.
+    """
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                pinecone_service.get_stats(),
+                *(rag_service.retrieve("getting started", [f]) for f in SUPPORTED_FRAMEWORKS),
+                return_exceptions=True
+            ),
+            timeout=WARM_UP_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up timed out after %ss", WARM_UP_TIMEOUT)
+        return
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        logger.warning("Warm-up finished with %s error(s): %s", len(failures), failures[0])
+    else:
+        logger.info("Warm-up complete")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown."""
+    logger.info(
+        "DevDocs AI Chatbot API starting (environment=%s, frameworks=%s)",
+        settings.environment,
+        ", ".join(SUPPORTED_FRAMEWORKS)
+    )
+
+    # Warm up in the background so a slow provider never delays serving
+    warm_up_task = asyncio.create_task(warm_up()) if settings.environment != "dev" else None
+
+    yield
+
+    # Let a cancelled warm-up unwind before its HTTP pool is closed
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warm_up_task
+
+    # Close the SDK clients and their shared HTTP connection pool
+    await clients.aclose()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="DevDocs AI Chatbot API",
     description="AI-powered chatbot for developer documentation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -53,21 +122,17 @@ async def root():
     }
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Startup event handler."""
-    print("=" * 80)
-    print("DevDocs AI Chatbot API Starting...")
-    print(f"Environment: {settings.environment}")
-    print(f"Supported Frameworks: {', '.join(SUPPORTED_FRAMEWORKS)}")
-    print("=" * 80)
-
-
 if __name__ == "__main__":
     import uvicorn
+
+    dev = settings.environment == "dev"
+    # loop and http stay on "auto", which picks uvloop and httptools where installed
     uvicorn.run(
         "main:app",
         host=settings.app_host,
         port=settings.app_port,
-        reload=settings.environment == "dev"
+        reload=dev,
+        # Multiple workers outside dev; each worker builds its own shared clients
+        # and keeps its own in-memory caches
+        workers=1 if dev else settings.workers
     )
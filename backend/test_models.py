@@ -1,12 +1,13 @@
 """Test which Claude models are available with the API key."""
+import asyncio
 import os
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
 # Load API key from .env
 from dotenv import load_dotenv
 load_dotenv()
 
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
 models_to_test = [
     "claude-3-5-sonnet-20241022",
@@ -18,24 +19,35 @@ models_to_test = [
     "claude-2.0",
 ]
 
-print("Testing which models are available with your API key...")
-print("=" * 80)
 
-for model in models_to_test:
+async def probe(model: str) -> str:
+    """Send a tiny request to a model and describe the outcome."""
     try:
-        response = client.messages.create(
+        await client.messages.create(
             model=model,
             max_tokens=10,
             messages=[{"role": "user", "content": "Hi"}]
         )
-        print(f"✅ {model} - WORKS")
+        return f"✅ {model} - WORKS"
     except Exception as e:
         error_msg = str(e)
         if "not_found_error" in error_msg or "404" in error_msg:
-            print(f"❌ {model} - NOT FOUND")
+            return f"❌ {model} - NOT FOUND"
         elif "permission" in error_msg.lower():
-            print(f"🔒 {model} - NO PERMISSION")
+            return f"🔒 {model} - NO PERMISSION"
         else:
-            print(f"⚠️  {model} - ERROR: {error_msg[:100]}")
+            return f"⚠️  {model} - ERROR: {error_msg[:100]}"
 
-print("=" * 80)
+
+async def main():
+    """Probe all models concurrently and print results in list order."""
+    print("Testing which models are available with your API key...")
+    print("=" * 80)
+
+    for result in await asyncio.gather(*(probe(model) for model in models_to_test)):
+        print(result)
+
+    print("=" * 80)
+
+
+asyncio.run(main())
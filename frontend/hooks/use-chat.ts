@@ -55,6 +55,15 @@ export function useChat() {
         content: msg.content,
       }));
 
+      // Stream the answer unless files need the multipart upload endpoint
+      if (!files || files.length === 0) {
+        return api.chatStream(
+          { message, frameworks: selectedFrameworks, history },
+          (content) => updateLastMessage({ content, isGenerating: false }),
+          controller.signal
+        );
+      }
+
       return api.chatWithFiles(message, selectedFrameworks, history, files, controller.signal);
     },
     onSuccess: (data) => {
@@ -144,6 +153,20 @@ export function useCodeGeneration() {
         content: msg.content,
       }));
 
+      // Stream the code unless files need the multipart upload endpoint
+      if (!files || files.length === 0) {
+        return api.generateCodeStream(
+          {
+            prompt,
+            frameworks: selectedFrameworks,
+            history,
+            include_docs_context: includeDocsContext,
+          },
+          (content) => updateLastMessage({ content, isGenerating: false }),
+          controller.signal
+        );
+      }
+
       return api.generateCodeWithFiles(
         prompt,
         selectedFrameworks,
@@ -11,6 +11,7 @@ import type {
   FeedbackRequest,
   FeedbackResponse,
   HealthResponse,
+  SourceNode,
 } from "@/types/api";
 
 // API configuration
@@ -58,6 +59,8 @@ apiClient.interceptors.response.use(
         throw new Error(`Server error: ${message}`);
       } else if (status === 404) {
         throw new Error("Endpoint not found");
+      } else if (status === 413) {
+        throw new Error(message);
       }
     } else if (error.request) {
       // Request made but no response
@@ -68,6 +71,83 @@ apiClient.interceptors.response.use(
   }
 );
 
+// Payload of a server-sent event from the streaming endpoints
+interface StreamEvent {
+  delta?: string;
+  detail?: string;
+  sources?: SourceNode[];
+  trace_id?: string | null;
+}
+
+/**
+ * POST a JSON body and dispatch each server-sent event from the response stream
+ */
+async function readEventStream(
+  path: string,
+  body: unknown,
+  onEvent: (event: string, data: StreamEvent) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  console.log(`[API] POST ${path} (stream)`);
+
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(body),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    const detail = await response
+      .json()
+      .then((data: { detail?: unknown }) => data?.detail)
+      .catch(() => undefined);
+    const message = typeof detail === "string" ? detail : response.statusText;
+
+    if (response.status === 422) {
+      throw new Error(`Validation error: ${message}`);
+    } else if (response.status === 404) {
+      throw new Error("Endpoint not found");
+    }
+    throw new Error(`Server error: ${message}`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let chunk = await reader.read();
+
+  while (!chunk.done) {
+    buffer += chunk.value;
+
+    // Events are separated by a blank line
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event: ")) {
+          event = line.slice(7);
+        } else if (line.startsWith("data: ")) {
+          data += line.slice(6);
+        }
+      }
+      if (data) {
+        onEvent(event, JSON.parse(data));
+      }
+
+      boundary = buffer.indexOf("\n\n");
+    }
+
+    chunk = await reader.read();
+  }
+}
+
 /**
  * API service methods
  */
@@ -88,6 +168,36 @@ export const api = {
     return response.data;
   },
 
+  /**
+   * Streaming chat endpoint - calls onDelta with the answer accumulated so far
+   */
+  chatStream: async (
+    request: ChatRequest,
+    onDelta: (content: string) => void,
+    signal?: AbortSignal
+  ): Promise<ChatResponse> => {
+    const result: ChatResponse = { response: "", sources: [] };
+
+    await readEventStream(
+      "/api/chat/stream",
+      request,
+      (event, data) => {
+        if (event === "error") {
+          throw new Error(`Server error: ${data.detail}`);
+        } else if (event === "sources") {
+          result.sources = data.sources ?? [];
+          result.trace_id = data.trace_id ?? undefined;
+        } else {
+          result.response += data.delta ?? "";
+          onDelta(result.response);
+        }
+      },
+      signal
+    );
+
+    return result;
+  },
+
   /**
    * Chat endpoint with file uploads
    */
@@ -138,6 +248,35 @@ export const api = {
     return response.data;
   },
 
+  /**
+   * Streaming code generation endpoint - calls onDelta with the code accumulated so far
+   */
+  generateCodeStream: async (
+    request: CodeGenerationRequest,
+    onDelta: (content: string) => void,
+    signal?: AbortSignal
+  ): Promise<CodeGenerationResponse> => {
+    const result: CodeGenerationResponse = { code: "" };
+
+    await readEventStream(
+      "/api/generate/stream",
+      request,
+      (event, data) => {
+        if (event === "error") {
+          throw new Error(`Server error: ${data.detail}`);
+        } else if (event === "done") {
+          result.trace_id = data.trace_id ?? undefined;
+        } else {
+          result.code += data.delta ?? "";
+          onDelta(result.code);
+        }
+      },
+      signal
+    );
+
+    return result;
+  },
+
   /**
    * Code generation with file uploads
    */